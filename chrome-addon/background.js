@@ -1,9 +1,33 @@
 let websocket;
 let keepAliveInterval;
+const textDecoder = new TextDecoder();
+const textEncoder = new TextEncoder();
+// Prompt message waiting for its binary image frame
+let pendingImageMessage = null;
+
+// Base64-encode an ArrayBuffer using the browser's native encoder
+const arrayBufferToBase64 = (buffer) => {
+    const bytes = new Uint8Array(buffer);
+    if (typeof bytes.toBase64 === 'function') {
+        return Promise.resolve(bytes.toBase64());
+    }
+    // Older Chrome versions: let FileReader encode it as a data URL
+    return new Promise((resolve, reject) => {
+        const reader = new FileReader();
+        reader.onloadend = () => {
+            // Remove the data URL prefix to get just the base64 string
+            resolve(reader.result.slice(reader.result.indexOf(',') + 1));
+        };
+        reader.onerror = reject;
+        reader.readAsDataURL(new Blob([bytes]));
+    });
+};
 
 const connectWebSocket = () => {
     console.log('Attempting to connect to WebSocket server...');
     websocket = new WebSocket('ws://localhost:8000/ws');
+    // The server sends JSON messages as binary frames
+    websocket.binaryType = 'arraybuffer';
 
     websocket.onopen = () => {
         console.log('WebSocket connection established.');
@@ -31,10 +55,42 @@ const connectWebSocket = () => {
         }, 20000); // Every 20 seconds
     };
 
-    websocket.onmessage = (event) => {
+    websocket.onmessage = async (event) => {
         try {
-            const message = JSON.parse(event.data);
-            console.log('Message from server: ', message);
+            let message;
+            if (pendingImageMessage) {
+                // A prompt with a binary image is followed by one frame with the raw image bytes
+                message = pendingImageMessage;
+                pendingImageMessage = null;
+                if (
+                    typeof event.data === 'string' ||
+                    event.data.byteLength !== message.data.image.len
+                ) {
+                    console.error('Did not receive image data for prompt:', message.id);
+                    const errorResponse = {
+                        id: message.id,
+                        type: 'response',
+                        data: {
+                            status: 'error',
+                            response: 'Failed to receive image data from server.',
+                        },
+                    };
+                    websocket.send(JSON.stringify(errorResponse));
+                    return;
+                }
+                message.data.image = await arrayBufferToBase64(event.data);
+            } else {
+                message = JSON.parse(
+                    typeof event.data === 'string' ? event.data : textDecoder.decode(event.data),
+                );
+                console.log('Message from server: ', message);
+
+                if (message.type === 'prompt' && message.data.image && message.data.image.binary) {
+                    // Wait for the image frame before forwarding the prompt
+                    pendingImageMessage = message;
+                    return;
+                }
+            }
 
             if (message.type === 'prompt') {
                 // First, try to find an existing ChatGPT tab
@@ -135,6 +191,7 @@ const connectWebSocket = () => {
     };
 
     websocket.onclose = () => {
+        pendingImageMessage = null;
         console.log('WebSocket connection closed. Reconnecting in 5 seconds...');
         if (keepAliveInterval) {
             clearInterval(keepAliveInterval);
@@ -179,7 +236,8 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
                 type: 'response',
                 data: responseData,
             };
-            websocket.send(JSON.stringify(serverMessage));
+            // Send as a binary frame so the server can parse the bytes without decoding them first
+            websocket.send(textEncoder.encode(JSON.stringify(serverMessage)));
         } else {
             console.error('WebSocket is not connected. Cannot send message to server.');
         }
@@ -1,11 +1,18 @@
 import asyncio
-import base64
+import importlib.util
+import itertools
 import logging
+import os
+import secrets
 import traceback
 import uuid
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
 from typing import Any, Literal
 
+import orjson
 from fastapi import (
+    Depends,
     FastAPI,
     File,
     Form,
@@ -14,12 +21,25 @@ from fastapi import (
     WebSocket,
     WebSocketDisconnect,
 )
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel, Field, field_validator
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+# uvloop is not available on Windows or PyPy. It is selected through uvicorn's
+# loop setting rather than a global event loop policy, which is deprecated from
+# Python 3.14 and would also affect any other program importing this module.
+HAS_UVLOOP = importlib.util.find_spec("uvloop") is not None
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the stdlib json module."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
 # Data model for incoming query requests
@@ -36,6 +56,16 @@ class QueryRequest(BaseModel):
     )
 
 
+# Data model for an image sent to the addon as a separate binary frame
+class BinaryImageData(BaseModel):
+    """Placeholder for an image whose raw bytes follow the prompt as a binary frame."""
+
+    binary: Literal[True] = Field(
+        True, description="Marks the image as sent in the next binary frame"
+    )
+    len: int = Field(..., description="Size of the image in bytes")
+
+
 # Data model for prompt message data sent to addon
 class PromptMessageData(BaseModel):
     """Data structure for prompt messages sent to the addon."""
@@ -44,7 +74,10 @@ class PromptMessageData(BaseModel):
     startNewChat: bool = Field(
         True, description="Whether to create a new chat before executing"
     )
-    image: str | None = Field(None, description="Base64 encoded image data (optional)")
+    image: str | BinaryImageData | None = Field(
+        None,
+        description="Base64 encoded image data, or a placeholder for an image sent as binary frame (optional)",
+    )
     useTemporaryChat: bool = Field(
         True, description="Whether to use temporary chat mode (disable for image generation)"
     )
@@ -95,6 +128,59 @@ class WebSocketMessage(BaseModel):
         return str(v)
 
 
+# Lightweight container for messages received from the addon
+@dataclass(slots=True)
+class IncomingMessage:
+    """
+    Message received from the addon over WebSocket.
+
+    Used instead of WebSocketMessage on the receive path: the addon is trusted,
+    so frames are decoded with orjson and dispatched on type without running
+    pydantic's union validation.
+    """
+
+    id: str
+    type: str
+    data: ResponseMessageData | dict[str, Any] | str
+
+
+class InvalidPayloadError(Exception):
+    """Raised when the payload of an addon message with a known ID cannot be handled."""
+
+    def __init__(self, request_id: str, reason: str) -> None:
+        super().__init__(reason)
+        self.request_id = request_id
+
+
+def parse_incoming_message(data: str | bytes) -> IncomingMessage:
+    """
+    Decode a raw WebSocket frame from the addon into an IncomingMessage.
+
+    Raises InvalidPayloadError if the frame carries a request ID but its
+    response payload cannot be built, so that request can be failed at once.
+    """
+    raw = orjson.loads(data)
+    payload = raw["data"]
+    # Payloads without a status are left as dicts for complete_request's dict branch
+    if raw["type"] == "response" and isinstance(payload, dict) and "status" in payload:
+        try:
+            generated_image = payload.get("generatedImage")
+            payload = ResponseMessageData.model_construct(
+                **{
+                    **payload,
+                    # The image is validated here, as QuerySuccessResponse reuses it as-is
+                    "generatedImage": (
+                        GeneratedImageData.model_validate(generated_image)
+                        if generated_image
+                        else None
+                    ),
+                }
+            )
+        except Exception as e:
+            raise InvalidPayloadError(raw["id"], str(e)) from e
+    return IncomingMessage(id=raw["id"], type=raw["type"], data=payload)
+
+
 # Response models for API endpoints
 class QuerySuccessResponse(BaseModel):
     """Success response model for query endpoints."""
@@ -114,42 +200,131 @@ class QueryErrorResponse(BaseModel):
     detail: str = Field(..., description="Error message")
 
 
+# Serializer for QuerySuccessResponse, built once instead of per response
+SUCCESS_RESPONSE_ADAPTER = TypeAdapter(QuerySuccessResponse)
+
+
+def build_success_response(
+    request_id: str, response_data: ResponseMessageData | dict[str, Any] | str
+) -> Response:
+    """
+    Build the success response for a completed query.
+
+    The QuerySuccessResponse is built once here and serialized directly to
+    JSON bytes, so the route does not need a response_model that would
+    validate it again.
+    """
+    if isinstance(response_data, ResponseMessageData):
+        # Its generated image was validated by parse_incoming_message and is reused as-is
+        success = QuerySuccessResponse.model_validate(
+            {
+                "request_id": request_id,
+                "response": response_data.response,
+                "generatedImage": response_data.generatedImage,
+            }
+        )
+    elif isinstance(response_data, dict):
+        # Structured response from the addon, merged like the response dict itself
+        success = QuerySuccessResponse.model_validate(
+            {"status": "success", "request_id": request_id, **response_data}
+        )
+    else:
+        # For simple string responses
+        success = QuerySuccessResponse(request_id=request_id, response=str(response_data))
+    return Response(
+        SUCCESS_RESPONSE_ADAPTER.dump_json(success, exclude_none=True),
+        media_type="application/json",
+    )
+
+
+# Maximum number of queries waiting on the addon before new ones are rejected
+MAX_IN_FLIGHT_REQUESTS = 256
+
+
 class ConnectionManager:
     """Manages WebSocket connections and request/response correlation."""
 
     def __init__(self) -> None:
-        self.active_connection: WebSocket | None = None
+        # Connected addon clients, keyed by a per-connection ID
+        self.connections: dict[str, WebSocket] = {}
+        # Number of requests in flight on each connection
+        self.loads: dict[str, int] = {}
+        # Keeps a prompt and its binary image frame together on each connection
+        self.send_locks: dict[str, asyncio.Lock] = {}
         self.pending_requests: dict[
             str, asyncio.Future[ResponseMessageData | dict[str, Any] | str]
         ] = {}  # To store Futures for correlating responses
+        # Connection each request was sent to
+        self.request_connections: dict[str, str] = {}
+        # Bounds the number of queries being processed at once
+        self.in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_REQUESTS)
 
-    async def connect(self, websocket: WebSocket) -> None:
-        """Accept and store a new WebSocket connection."""
+    async def connect(self, websocket: WebSocket) -> str:
+        """Accept and store a new WebSocket connection, returning its ID."""
         await websocket.accept()
-        self.active_connection = websocket
-        logging.info("WebSocket connection established.")
-
-    def disconnect(self) -> None:
-        """Close the WebSocket connection and cancel pending requests."""
-        self.active_connection = None
+        connection_id = uuid.uuid4().hex
+        self.connections[connection_id] = websocket
+        self.loads[connection_id] = 0
+        self.send_locks[connection_id] = asyncio.Lock()
+        logging.info(
+            f"WebSocket connection established: {connection_id} ({len(self.connections)} connected)"
+        )
+        return connection_id
+
+    def disconnect(self, connection_id: str) -> None:
+        """Forget a WebSocket connection and cancel the requests sent to it."""
+        if self.connections.pop(connection_id, None) is None:
+            return
+        _ = self.loads.pop(connection_id, None)
+        _ = self.send_locks.pop(connection_id, None)
         # Cancel any pending futures for this disconnected client
-        for future in self.pending_requests.values():
-            if not future.done():
+        request_ids = [
+            request_id
+            for request_id, request_connection in self.request_connections.items()
+            if request_connection == connection_id
+        ]
+        for request_id in request_ids:
+            del self.request_connections[request_id]
+            future = self.pending_requests.pop(request_id, None)
+            if future is not None and not future.done():
                 _ = future.cancel()
-        self.pending_requests.clear()
-        logging.info("WebSocket connection closed.")
+        logging.info(
+            f"WebSocket connection closed: {connection_id} ({len(self.connections)} connected)"
+        )
 
-    async def send_to_client(self, message: WebSocketMessage) -> None:
-        """Send a message to the connected addon client."""
-        if self.active_connection:
+    def release_request(self, request_id: str) -> None:
+        """Decrement the load of the connection a finished request was sent to."""
+        connection_id = self.request_connections.pop(request_id, None)
+        if connection_id in self.loads:
+            self.loads[connection_id] -= 1
+
+    async def send_to_client(
+        self, message: WebSocketMessage, image: bytes | None = None
+    ) -> None:
+        """
+        Send a message to the least loaded addon client.
+
+        If image is given, its raw bytes are sent as a binary frame directly
+        after the message, which must carry a BinaryImageData placeholder.
+        """
+        if self.connections:
+            connection_id = min(self.loads, key=self.loads.__getitem__)
+            websocket = self.connections[connection_id]
+            self.loads[connection_id] += 1
+            self.request_connections[message.id] = connection_id
             try:
-                await self.active_connection.send_text(message.model_dump_json())
+                # Serialize straight to JSON bytes, without an intermediate dict or str
+                payload = WebSocketMessage.__pydantic_serializer__.to_json(message)
+                async with self.send_locks[connection_id]:
+                    await websocket.send_bytes(payload)
+                    if image is not None:
+                        await websocket.send_bytes(image)
                 # logging.info(f"Sent message to client: {message.model_dump_json()}")
             except (
                 RuntimeError
             ) as e:  # Handle cases where connection might close mid-send
                 logging.error(f"Failed to send message to client: {e}")
-                self.disconnect()  # Force disconnect if sending fails
+                self.disconnect(connection_id)  # Force disconnect if sending fails
         else:
             logging.warning("No active WebSocket connection to send message.")
             raise HTTPException(
@@ -165,74 +340,132 @@ class ConnectionManager:
         )
         self.pending_requests[request_id] = future
         try:
-            return await asyncio.wait_for(
-                future, timeout=120
-            )  # 2 minute timeout for response
-        except asyncio.TimeoutError:
+            async with asyncio.timeout(120):  # 2 minute timeout for response
+                return await future
+        except TimeoutError:
+            # complete_request removes answered requests; drop the unanswered one here
+            _ = self.pending_requests.pop(request_id, None)
+            self.release_request(request_id)
             logging.error(f"Timeout waiting for response for request ID: {request_id}")
             raise HTTPException(
                 status_code=504, detail="Timeout waiting for response from addon."
             )
         except asyncio.CancelledError:
+            _ = self.pending_requests.pop(request_id, None)
+            self.release_request(request_id)
             logging.warning(f"Future for request ID {request_id} was cancelled.")
             raise HTTPException(
                 status_code=503, detail="Request cancelled due to client disconnection."
             )
-        finally:
-            _ = self.pending_requests.pop(request_id, None)
 
-    def complete_request(self, message: WebSocketMessage) -> None:
+    def complete_request(self, message: IncomingMessage) -> None:
         """Completes a pending Future when a response is received."""
-        if message.id in self.pending_requests:
-            future = self.pending_requests.pop(message.id)
-            if not future.done():
-                # Handle ResponseMessageData Pydantic model
-                if isinstance(message.data, ResponseMessageData):
-                    if message.data.status == "error":
-                        error_detail = message.data.reason or message.data.response or "Unknown error from addon"
-                        future.set_exception(
-                            HTTPException(
-                                status_code=400,
-                                detail=error_detail,
-                            )
-                        )
-                    else:
-                        # For success responses, convert to dict
-                        future.set_result(message.data.model_dump())
-                # If data is a dict with status/response structure, extract or pass as-is
-                elif isinstance(message.data, dict):
-                    # Check if it's an error response
-                    if message.data.get("status") == "error":
-                        error_detail = message.data.get(
-                            "reason", message.data.get("response", "Unknown error from addon")
-                        )
-                        future.set_exception(
-                            HTTPException(
-                                status_code=400,
-                                detail=error_detail,
-                            )
-                        )
-                    else:
-                        # For success or other structured responses, pass the whole dict
-                        future.set_result(message.data)
-                elif isinstance(message.data, str):
-                    # For simple string responses
-                    future.set_result(message.data)
-                else:
-                    # For other Pydantic model responses, convert to dict
-                    if hasattr(message.data, "model_dump"):
-                        future.set_result(message.data.model_dump())
-                    else:
-                        future.set_result(str(message.data))
-                logging.info(f"Completed request ID: {message.id}")
-        else:
+        future = self.pending_requests.pop(message.id, None)
+        if future is None:
             logging.warning(
                 f"Received response for unknown or completed request ID: {message.id}"
             )
+            return
+        self.release_request(message.id)
+        if future.done():
+            return
+        try:
+            self.resolve_future(future, message)
+        except Exception as e:
+            # Never leave the request waiting for its timeout because of a bad frame
+            logging.error(f"Failed to handle response for request ID {message.id}: {e}")
+            if not future.done():
+                future.set_exception(
+                    HTTPException(
+                        status_code=502,
+                        detail="Invalid response from addon.",
+                    )
+                )
+            return
+        logging.info(f"Completed request ID: {message.id}")
+
+    def fail_request(self, request_id: str) -> None:
+        """Fail a pending request at once because its response could not be parsed."""
+        future = self.pending_requests.pop(request_id, None)
+        if future is None:
+            return
+        self.release_request(request_id)
+        if not future.done():
+            future.set_exception(
+                HTTPException(
+                    status_code=502,
+                    detail="Invalid response from addon.",
+                )
+            )
+
+    def resolve_future(
+        self,
+        future: asyncio.Future[ResponseMessageData | dict[str, Any] | str],
+        message: IncomingMessage,
+    ) -> None:
+        """Set the result or exception of a request's Future from its response."""
+        # Handle ResponseMessageData Pydantic model
+        if isinstance(message.data, ResponseMessageData):
+            if message.data.status == "error":
+                error_detail = message.data.reason or message.data.response or "Unknown error from addon"
+                future.set_exception(
+                    HTTPException(
+                        status_code=400,
+                        detail=error_detail,
+                    )
+                )
+            else:
+                # For success responses, hand over the model itself
+                future.set_result(message.data)
+        # If data is a dict with status/response structure, extract or pass as-is
+        elif isinstance(message.data, dict):
+            # Check if it's an error response
+            if message.data.get("status") == "error":
+                error_detail = message.data.get(
+                    "reason", message.data.get("response", "Unknown error from addon")
+                )
+                future.set_exception(
+                    HTTPException(
+                        status_code=400,
+                        detail=error_detail,
+                    )
+                )
+            else:
+                # For success or other structured responses, pass the whole dict
+                future.set_result(message.data)
+        elif isinstance(message.data, str):
+            # For simple string responses
+            future.set_result(message.data)
 
 
 manager = ConnectionManager()
 
+# Request IDs are a random per-process prefix plus a counter, so that generating
+# one needs no call into the OS random source
+REQUEST_ID_PREFIX = secrets.token_hex(4)
+request_counter = itertools.count()
+
+
+def new_request_id() -> str:
+    """Return a request ID that is unique within this server process."""
+    return f"{REQUEST_ID_PREFIX}-{next(request_counter):x}"
+
+
+# Set LOG_PRETTY=1 to pretty-print debug-logged frames with base64 data truncated
+LOG_PRETTY = os.environ.get("LOG_PRETTY") == "1"
+
+
+# Characters that may appear in standard base64 encoded data
+BASE64_ALPHABET = (
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+)
+
+
+def is_base64_text(text: str) -> bool:
+    """Check whether a string consists only of base64 characters."""
+    # Deleting every base64 character in one C-level pass leaves nothing behind
+    return text.isascii() and not text.encode("ascii").translate(None, BASE64_ALPHABET)
+
 
 def truncate_base64_in_log(data: str) -> str:
     """
@@ -240,8 +473,7 @@ def truncate_base64_in_log(data: str) -> str:
     Replaces long base64 strings with a placeholder showing their length.
     """
     import json
-    import re
-    
+
     try:
         # Try to parse as JSON
         parsed = json.loads(data)
@@ -254,7 +486,7 @@ def truncate_base64_in_log(data: str) -> str:
                 return [truncate_recursive(item) for item in obj]
             elif isinstance(obj, str):
                 # Check if it looks like base64 (long string with base64 characters)
-                if len(obj) > 100 and re.match(r'^[A-Za-z0-9+/=]+$', obj):
+                if len(obj) > 100 and is_base64_text(obj):
                     return f"<base64 data: {len(obj)} chars>"
                 return obj
             return obj
@@ -266,6 +498,16 @@ def truncate_base64_in_log(data: str) -> str:
         return data
 
 
+def format_raw_message(data: str | bytes) -> str:
+    """Shorten a raw WebSocket frame for debug logging."""
+    if LOG_PRETTY:
+        return truncate_base64_in_log(
+            data if isinstance(data, str) else data.decode(errors="replace")
+        )
+    text = data[:500] if isinstance(data, str) else data[:500].decode(errors="replace")
+    return text + f"...<{len(data)} bytes>" if len(data) > 500 else text
+
+
 @app.get("/", response_class=HTMLResponse)
 async def get() -> HTMLResponse:
     """Root endpoint to check if the server is running."""
@@ -281,51 +523,130 @@ async def health_check() -> dict[str, Any]:
         A dictionary containing:
         - status: "healthy" if addon is connected, "degraded" if not
         - addon_connected: Boolean indicating WebSocket connection status
+        - addon_connections: Number of connected addon clients
         - pending_requests: Number of requests awaiting response
     """
-    addon_connected = manager.active_connection is not None
+    addon_connections = len(manager.connections)
     pending_count = len(manager.pending_requests)
 
     return {
-        "status": "healthy" if addon_connected else "degraded",
-        "addon_connected": addon_connected,
+        "status": "healthy" if addon_connections else "degraded",
+        "addon_connected": addon_connections > 0,
+        "addon_connections": addon_connections,
         "pending_requests": pending_count,
     }
 
 
+# Maximum number of received frames waiting to be processed before reading pauses
+RECEIVE_QUEUE_SIZE = 64
+
+
+async def receive_frame(websocket: WebSocket) -> str | bytes:
+    """
+    Receive the next text or binary frame from the addon.
+
+    Binary frames are passed on as bytes, so they are never decoded to str
+    before orjson parses them.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+
+def handle_control_message(msg: IncomingMessage) -> None:
+    """Handle control messages like keep-alive pings."""
+    logging.debug(f"Received control message: {msg.data}")
+    # Could send a pong back if needed
+
+
+def handle_unknown_message(msg: IncomingMessage) -> None:
+    """Log messages of a type the server does not handle."""
+    logging.warning(f"Received unhandled message type: {msg.type} with ID: {msg.id}")
+
+
+# Handlers for messages received from the addon, keyed by message type
+MESSAGE_HANDLERS: dict[str, Callable[[IncomingMessage], None]] = {
+    "response": manager.complete_request,
+    "control": handle_control_message,
+}
+
+
+async def process_messages(queue: asyncio.Queue[str | bytes | None]) -> None:
+    """
+    Parse and dispatch frames received from the addon, one at a time.
+
+    Returns once it takes None from the queue, after every frame queued
+    before it has been handled.
+    """
+    while True:
+        data = await queue.get()
+        if data is None:
+            return
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Received raw message from client: {format_raw_message(data)}")
+        try:
+            msg = parse_incoming_message(data)
+            MESSAGE_HANDLERS.get(msg.type, handle_unknown_message)(msg)
+        except InvalidPayloadError as e:
+            logging.error(f"Invalid response payload for request ID {e.request_id}: {e}")
+            manager.fail_request(e.request_id)
+        except Exception as e:
+            logging.error(
+                f"Error parsing WebSocket message: {e} - Raw data: {format_raw_message(data)}"
+            )
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket) -> None:
-    """WebSocket endpoint for addon communication."""
-    await manager.connect(websocket)
+    """
+    WebSocket endpoint for addon communication.
+
+    This coroutine only reads frames and queues them; a separate worker task
+    parses and dispatches them, so a slow message never delays the next read.
+    The bounded queue applies backpressure if the worker falls behind.
+    """
+    connection_id = await manager.connect(websocket)
+    queue: asyncio.Queue[str | bytes | None] = asyncio.Queue(maxsize=RECEIVE_QUEUE_SIZE)
+    worker = asyncio.create_task(process_messages(queue))
     try:
         while True:
-            data = await websocket.receive_text()
-            logging.info(f"Received raw message from client: {truncate_base64_in_log(data)}")
-            try:
-                msg = WebSocketMessage.model_validate_json(data)
-                if msg.type == "response":
-                    manager.complete_request(msg)
-                elif msg.type == "control":
-                    # Handle control messages like keep-alive pings
-                    logging.debug(f"Received control message: {msg.data}")
-                    # Could send a pong back if needed
-                else:
-                    logging.warning(
-                        f"Received unhandled message type: {msg.type} with ID: {msg.id}"
-                    )
-            except Exception as e:
-                logging.error(
-                    f"Error parsing WebSocket message: {e} - Raw data: {data}"
-                )
+            await queue.put(await receive_frame(websocket))
     except WebSocketDisconnect:
-        manager.disconnect()
+        pass
     except Exception as e:
         logging.error(f"WebSocket error: {e}")
-        manager.disconnect()
+    finally:
+        try:
+            # Handle the frames already received before failing the pending requests
+            await queue.put(None)
+            await worker
+        finally:
+            manager.disconnect(connection_id)
+            _ = worker.cancel()
+
+
+async def reserve_request_slot() -> AsyncIterator[None]:
+    """
+    Hold one in-flight request slot for the duration of a query.
+
+    Rejects the query with 429 instead of queueing it when all slots are
+    taken, so a slow addon cannot pile up unbounded pending requests.
+    """
+    if manager.in_flight.locked():
+        raise HTTPException(status_code=429, detail="Too many in-flight requests.")
+    async with manager.in_flight:
+        yield
 
 
-@app.post("/query", response_model=QuerySuccessResponse)
-async def send_query(query_request: QueryRequest) -> dict[str, Any]:
+@app.post(
+    "/query",
+    responses={200: {"model": QuerySuccessResponse}},
+    dependencies=[Depends(reserve_request_slot)],
+)
+async def send_query(query_request: QueryRequest) -> Response:
     """
     Send a query with optional base64-encoded image.
 
@@ -346,21 +667,23 @@ async def send_query(query_request: QueryRequest) -> dict[str, Any]:
     Returns:
         QuerySuccessResponse with status, request_id, and response text
     """
-    if not manager.active_connection:
+    if not manager.connections:
         raise HTTPException(
             status_code=503, detail="WebSocket connection not established with addon."
         )
 
-    request_id = uuid.uuid4().hex
-    # Create structured message data using Pydantic model
-    message_data = PromptMessageData(
+    request_id = new_request_id()
+    # Create structured message data; inputs are already validated by FastAPI
+    message_data = PromptMessageData.model_construct(
         prompt=query_request.prompt,
         startNewChat=query_request.startNewChat,
         image=query_request.image,
         useTemporaryChat=query_request.useTemporaryChat,
     )
 
-    prompt_message = WebSocketMessage(id=request_id, type="prompt", data=message_data)
+    prompt_message = WebSocketMessage.model_construct(
+        id=request_id, type="prompt", data=message_data
+    )
 
     await manager.send_to_client(
         prompt_message
@@ -370,16 +693,7 @@ async def send_query(query_request: QueryRequest) -> dict[str, Any]:
         # Wait for the response from the addon
         response_data = await manager.await_response(request_id)
 
-        # If response_data is already a dict (structured response), return it
-        if isinstance(response_data, dict):
-            return {"status": "success", "request_id": request_id, **response_data}
-        else:
-            # For simple string responses
-            return {
-                "status": "success",
-                "request_id": request_id,
-                "response": response_data,
-            }
+        return build_success_response(request_id, response_data)
     except HTTPException:
         # Re-raise HTTPExceptions (including those from error responses)
         raise
@@ -389,15 +703,19 @@ async def send_query(query_request: QueryRequest) -> dict[str, Any]:
         raise e
 
 
-@app.post("/query/upload", response_model=QuerySuccessResponse)
+@app.post(
+    "/query/upload",
+    responses={200: {"model": QuerySuccessResponse}},
+    dependencies=[Depends(reserve_request_slot)],
+)
 async def send_query_with_upload(
     prompt: str = Form(...),
     image: UploadFile | None = File(None),
     startNewChat: bool = Form(True),
     useTemporaryChat: bool = Form(True),
-) -> dict[str, Any]:
+) -> Response:
     """
-    Send a query with optional file upload (image will be auto-encoded to base64).
+    Send a query with optional file upload (image is sent to the addon as raw bytes).
     
     Example using curl:
         curl -X POST "http://localhost:8000/query/upload" \\
@@ -424,57 +742,48 @@ async def send_query_with_upload(
     Returns:
         QuerySuccessResponse with status, request_id, and response text
     """
-    if not manager.active_connection:
+    if not manager.connections:
         raise HTTPException(
             status_code=503, detail="WebSocket connection not established with addon."
         )
 
-    request_id = uuid.uuid4().hex
-    image_base64: str | None = None
+    request_id = new_request_id()
+    image_bytes: bytes | None = None
 
-    # If an image file is uploaded, read and encode it to base64
+    # If an image file is uploaded, read it; it is sent to the addon as a binary frame
     if image:
         try:
-            # Read the file contents
+            # The bytes are forwarded as-is; no CPU-bound encoding happens here
             image_bytes = await image.read()
 
-            # Encode to base64
-            image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-
-            logging.info(
-                f"Image uploaded: {image.filename} ({len(image_bytes)} bytes, {len(image_base64)} base64 chars)"
-            )
+            logging.info(f"Image uploaded: {image.filename} ({len(image_bytes)} bytes)")
         except Exception as e:
             logging.error(f"Error processing uploaded image: {e}")
             raise HTTPException(
                 status_code=400, detail=f"Failed to process uploaded image: {str(e)}"
             )
 
-    # Create structured message data using Pydantic model
-    message_data = PromptMessageData(
-        prompt=prompt, startNewChat=startNewChat, image=image_base64, useTemporaryChat=useTemporaryChat
+    # Create structured message data; inputs are already validated by FastAPI
+    message_data = PromptMessageData.model_construct(
+        prompt=prompt,
+        startNewChat=startNewChat,
+        image=BinaryImageData.model_construct(len=len(image_bytes)) if image_bytes is not None else None,
+        useTemporaryChat=useTemporaryChat,
     )
 
-    prompt_message = WebSocketMessage(id=request_id, type="prompt", data=message_data)
+    prompt_message = WebSocketMessage.model_construct(
+        id=request_id, type="prompt", data=message_data
+    )
 
     await manager.send_to_client(
-        prompt_message
+        prompt_message, image_bytes
     )  # This might raise HTTPException if send fails
 
     try:
         # Wait for the response from the addon
         response_data = await manager.await_response(request_id)
 
-        # If response_data is already a dict (structured response), return it
-        if isinstance(response_data, dict):
-            return {"status": "success", "request_id": request_id, **response_data}
-        else:
-            # For simple string responses
-            return {
-                "status": "success",
-                "request_id": request_id,
-                "response": response_data,
-            }
+        return build_success_response(request_id, response_data)
     except HTTPException:
         # Re-raise HTTPExceptions (including those from error responses)
         raise
@@ -487,4 +796,11 @@ async def send_query_with_upload(
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop" if HAS_UVLOOP else "asyncio",
+        http="httptools",
+        ws="websockets",
+    )